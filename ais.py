@@ -12,13 +12,16 @@
 #   along with this program.  If not, see <http://www.gnu.org/licenses/>.
 
 #	Usage: Create a text data file containing key AIS data.  Presently the program
-#	only accepts 3 types of AIS messages (1, 18 & 24).  Message type 1 is for
-#	class A vessel position report.  For Type 1 we only indicate channel A.  Maybe
-#	later this will be changed to get the channel from the data file.  Type 18 is
-#	for class B vessel position report.  Type 24 is for class B vessel static
-#	information.  There are 2 subtypes of a type 24 message (A and B or 0 and 1).
-#	The first type is mainly for the vessel name.  The second type is for call
-#	sign and vessel type.  Both subtypes are currently supported.  See example file
+#	accepts 7 types of AIS messages (1, 5, 18, 19, 21, 24 & 27), their layouts are
+#	declared in aismsg.py.  Message type 1 is for class A vessel position report.
+#	For Type 1 the channel is A unless the data file gives a CHANNEL.  Type 5 is the
+#	class A static and voyage related data (sent as 2 sentences).  Type 18 is for
+#	class B vessel position report and type 19 for the extended class B report.
+#	Type 21 is the aid-to-navigation report and type 27 the long range position
+#	report.  Type 24 is for class B vessel static information.  There are 2 subtypes
+#	of a type 24 message (A and B or 0 and 1).  The first type is mainly for the
+#	vessel name.  The second type is for call sign and vessel type.  Both subtypes
+#	are currently supported.  See example file
 #	sample.txt for examples of each type of message.   For help just run the
 #	script as 'python AISconverter' without arguments.  It will print out a little
 #	usage help.  The most common example of arguments would be:
@@ -42,6 +45,11 @@ import getopt
 from datetime import datetime
 from target import Target
 from target import to_angle
+import aismsg
+try:
+    import nmeafmt
+except ImportError:     # no numpy, sentences formatted one by one
+    nmeafmt = None
 
 # default argument values
 port = 10110    # Default port
@@ -51,22 +59,19 @@ dest = "localhost" # Default destination IP address
 
 tcpTimeout = 5.0    # Timeout for inactive TCP socket
 tcpConnectTimeout = 120.0	# Wait 60 seconds for a connection then exit
+fleet = 0       # Number of synthetic vessels, 0 = default targets
+seed = None     # Seed of the synthetic traffic generator
+scenario = None # Scenario file to read the targets from
+save = None     # Scenario file to save the synthetic fleet to
+channelModel = False    # Send the reports through the VDL channel model (vdl.py)
+statsInterval = 60.0    # Time between VDL channel statistics
+workers = 0     # Encoder threads of the pipeline (pipeline.py), 0 = no pipeline
+batch = 100     # Targets encoded at a time (sentences formatted together)
+archivePrefix = None    # Write the sent messages to compressed archive files (archive.py)
+archiveRotate = 3600.0  # Time before a new archive file is started
 Space = ' '
 Equals = '='
-
-#ais NMEA payload encoding
-payloadencoding = {0:'0',1:'1',2:'2',3:'3',4:'4',5:'5',6:'6',7:'7',8:'8',9:'9',10:':',11:';',
-                   12:'<',13:'=',14:'>',15:'?',16:'@',17:'A',18:'B',19:'C',20:'D',21:'E',22:'F',23:'G',24:'H',
-                   25:'I',26:'J',27:'K',28:'L',29:'M',30:'N',31:'O',32:'P',33:'Q',34:'R',
-                   35:'S',36:'T',37:'U',38:'V',39:'W',40:'`',41:'a',42:'b',43:'c',44:'d',
-                   45:'e',46:'f',47:'g',48:'h',49:'i',50:'j',51:'k',52:'l',53:'m',54:'n',
-                   55:'o',56:'p',57:'q',58:'r',59:'s',60:'t',61:'u',62:'v',63:'w'}
-
-# Sixbit ASCII encoding
-sixbitencoding = {'@':0,'A':1,'B':2,'C':3,'D':4,'E':5,'F':6,'G':7,'H':8,'I':9,'J':10,'K':11,'L':12,'M':13,'N':14,'O':15,
-                  'P':16,'Q':17,'R':18,'S':19,'T':20,'U':21,'V':22,'W':23,'X':24,'Y':25,'Z':26,'[':27,'\\':28,']':29,'^':30,'_':31,
-                  ' ':32,'!':33,'"':34,'#':35,'$':36,'%':37,'&':38,'\'':39,'(':40,')':41,'*':42,'+':43,',':44,'-':45,'.':46,'/':47,
-                  '0':48,'1':49,'2':50,'3':51,'4':52,'5':53,'6':54,'7':55,'8':56,'9':57,':':58,';':59,'<':60,'=':61,'>':62,'?':63}
+Ignore = {'"'}
 
 def Str2Float (str, exc):
     result = float(Str2Str(str,exc))
@@ -76,61 +81,19 @@ def Str2Int (str, exc):
     result = int(Str2Str(str,exc))
     return result
 
-def Str2Six (str, length):
-    result = []
-    for letter in str:
-        result = result + Int2BString(sixbitencoding[letter],6)
-    while len(result) < length:
-        result = result + Int2BString(sixbitencoding['@'],6)
-    result = result[0:length]
-    return result
-
 def Str2Str (str, exc):
     result = ''.join(ch for ch in str if ch not in exc)
     return result
 
-def Int2BString (value, length):
-    ZeroOne = dict({0: '0', 1: '1'})
-    index = length
-    result = list((' ' * length)[:length])
-    while (index > 0):
-        result[index-1] = ZeroOne[divmod(value,2)[1]]
-        value = value//2
-        index=index-1
-    result = result[0:length]
-    return result
-
-def BString2Int(bitlist):  # convert reversed bit string to int
-    length = len(bitlist)
-    index = 0
-    value = 0
-    while (index < length):
-        value = value + Str2Int(bitlist[index],'')*pow(2,index)
-        index = index + 1
-    return value
-
-def NMEAencapsulate(BigString,sixes):
-    capsule = ''
-    intChars = list(range(0,sixes))
-    BitPositions = [5,4,3,2,1,0]
-    for chindex in range(0,sixes):
-        StrVal = [BigString[index] for index in BitPositions]
-        intChars[chindex] = BString2Int(StrVal)
-        for idx in [0,1,2,3,4,5]:
-            BitPositions[idx] = BitPositions[idx]+6
-            
-    # Now intChars contains the encoded bits for the AIS string
-    for chindex in range(0,sixes):
-        capsule = capsule + payloadencoding[intChars[chindex]]
-
-    # Now we have the NMEA payload in capsule
-    return capsule
-
 def nmeaEncode(LineDict):
-    Ignore = {'"'}
-    if LineDict["TYPE"] == "1":
-        # This is a Class A position update message
-        # TYPE:"1" MMSI:"24416300" STATUS:"5" SPEED:5.0 LON:121.745400 LAT:25.135410 COURSE:113.0 HEADING:30.0 TIMESTAMP:"2015-11-19T05:19:47"
+    # Encodes one line of the data file. TYPE selects the message layout in aismsg.MESSAGES,
+    # the other keys are the field names in upper case, missing fields are "not available".
+    # TYPE="1" MMSI="24416300" STATUS="5" SPEED="5.0" LON="121.745400" LAT="25.135410" COURSE="113.0" HEADING="30" TIMESTAMP="2015-11-19T05:19:47"
+    # TYPE="18" MMSI="367415980" SPEED="5" LON="121.745400" LAT="24.135000" COURSE="113" HEADING="30" CHANNEL="B" TIMESTAMP="2015-11-19T05:19:48"
+    # TYPE="24" MMSI="367415980" PART_NO="0" CHANNEL="A" SHIP_NAME="WHISPER"
+    # TYPE="24" MMSI="367415980" PART_NO="1" CHANNEL="B" SHIP_TYPE="8" CALL_SIGN="WDE9319"
+    # TYPE="5" MMSI="24416300" SHIP_NAME="ARMOR" CALL_SIGN="FABC" SHIP_TYPE="70" DRAUGHT="8.5" DESTINATION="BREST"
+    # Types 19, 21 and 27 are also supported, see aismsg.py for their fields.
         # STATUS see: https://www.navcen.uscg.gov/?pageName=AISMessagesA
         # STATUS
  	#    0 = under way using engine, 
@@ -149,127 +112,33 @@ def nmeaEncode(LineDict):
         #    13 = reserved for future use,
         #    14 = AIS-SART (active), MOB-AIS, EPIRB-AIS
         #    15 = undefined = default (also used by AIS-SART, MOB-AIS and EPIRB-AIS under test)
-        cog = LineDict["COURSE"]
-        mmsi = Str2Int(LineDict["MMSI"],Ignore)
-        lat = LineDict["LAT"]
-        lon = LineDict["LON"]
-        speed = LineDict["SPEED"]*10.0 # speed in dict is real speed
-        status = Str2Int(LineDict["STATUS"],Ignore)
-        heading = LineDict["HEADING"]
-
+    name = Str2Str(LineDict["TYPE"],Ignore)
+    if name == "24":
+        name = "24B" if Str2Int(LineDict["PART_NO"],Ignore) == 1 else "24A"
+    if name not in aismsg.MESSAGES:
+        raise ValueError("Unsupported message type " + name)
+
+    fields = {}
+    for fname, kind, bits, scale, default in aismsg.MESSAGES[name]:
+        key = fname.upper()
+        if kind == 'c' or key not in LineDict:
+            continue
+        value = LineDict[key]
+        if kind == 't':
+            fields[fname] = Str2Str(value,Ignore)
+        elif isinstance(value, str):
+            fields[fname] = Str2Float(value,Ignore)
+        else:
+            fields[fname] = value
+    if "accuracy" not in fields and ('accuracy', 'u', 1, 1, 0) in aismsg.MESSAGES[name]:
+        fields["accuracy"] = 1      # high position accuracy, as sent by the targets
+    if "TIMESTAMP" in LineDict and "second" not in fields:
         tStamp = LineDict["TIMESTAMP"]
-        tSecond = Str2Int(tStamp[len(tStamp)-2:len(tStamp)],Ignore)
-        MessageID = Int2BString(Str2Int(LineDict["TYPE"],Ignore),6)
-        RepeatIndicator = Int2BString(0,2)
-        UserID = Int2BString(mmsi,30)
-        NavStatus = Int2BString(status,4)
-        RotAIS = Int2BString(-128,8)   # default is "not-available"
-        SOG = Int2BString(speed,10)    # We assume the speed in the data set is in 1/10 knot
-        PosAccuracy = Int2BString(1,1)
-        Longitude = Int2BString(int(lon*600000),28)
-        Latitude = Int2BString(int(lat*600000),27)
-        COG = Int2BString(int(cog*10),12)
-        Heading = Int2BString(heading,9)
-        TimeStamp = Int2BString(tSecond,6)
-        Mi = Int2BString(0,2)
-        Spare = Int2BString(0,3)
-        RAIM = Int2BString(0,1)
-        CommStat = Int2BString(0,19)
-
-        BigString = MessageID
-        BigString = BigString+RepeatIndicator
-        BigString = BigString+UserID
-        BigString = BigString+NavStatus
-        BigString = BigString+RotAIS
-        BigString = BigString+SOG
-        BigString = BigString+PosAccuracy
-        BigString = BigString+Longitude
-        BigString = BigString+Latitude
-        BigString = BigString+COG
-        BigString = BigString+Heading
-        BigString = BigString+TimeStamp
-        BigString = BigString+Mi
-        BigString = BigString+Spare
-        BigString = BigString+RAIM
-        BigString = BigString+CommStat
-        capsule = NMEAencapsulate(BigString, 28)
-        aisnmea = 'AIVDM,1,1,,A,'+ capsule + ',O'
-
-    if LineDict["TYPE"] == "18":
-        # This is a Class B position update message
-        # TYPE : "18" MMSI:"367415980" SPEED:"5" LON:"121.745400" LAT:"24.135000" COURSE:"113" HEADING:"30" CHANNEL:"B" TIMESTAMP:"2015-11-19T05:19:48"
-        MessageID = Int2BString(Str2Int(LineDict["TYPE"],Ignore),6)
-        RepeatIndicator = Int2BString(0,2)
-        MMSI = Int2BString(Str2Int(LineDict["MMSI"],Ignore),30)
-        Spare1 = Int2BString(0,8)
-        Channel = LineDict["CHANNEL"]
-
-        sog = LineDict["SPEED"]*10.0
-        SOG = Int2BString(sog,10)
-
-        PosAccuracy = Int2BString(1,1)
-
-        lon = LineDict["LON"]
-        Longitude = Int2BString(int(lon*600000),28)
-
-        lat = LineDict["LAT"]
-        Latitude = Int2BString(int(lat*600000),27)
-
-        cog = LineDict["COURSE"]
-        COG = Int2BString(int(cog*10),12)
-
-        heading = LineDict["HEADING"]
-        Heading = Int2BString(heading,9)
+        fields["second"] = Str2Int(tStamp[len(tStamp)-2:len(tStamp)],Ignore)
 
-        tStamp = LineDict["TIMESTAMP"]
-        tSecond = Str2Int(tStamp[len(tStamp)-2:len(tStamp)],Ignore)
-        TimeStamp = Int2BString(tSecond,6)
-
-        Spare2 = Int2BString(0,2)
-
-        State = Int2BString(393222,27)
-
-
-        BigString = MessageID
-        BigString = BigString+RepeatIndicator
-        BigString = BigString+MMSI+Spare1+SOG+PosAccuracy+Longitude+Latitude+COG+Heading+TimeStamp+Spare2
-        BigString = BigString+State
-        capsule = NMEAencapsulate(BigString, 28)
-        aisnmea = 'AIVDM,1,1,,' + Channel +','+ capsule + ',O'
-
-    if LineDict["TYPE"] == "24":
-        # This is a Class B Static Data Report
-        # TYPE="24" MMSI="367415980" PART_NO="0" CHANNEL="A" SHIP_NAME="WHISPER"
-        # TYPE="24" MMSI="367415980" PART_NO="1" CHANNEL="B" SHIP_TYPE="8" CALL_SIGN="WDE9319"
-        MessageID = Int2BString(Str2Int(LineDict["TYPE"],Ignore),6)
-        RepeatIndicator = Int2BString(0,2)
-        MMSI = Int2BString(Str2Int(LineDict["MMSI"],Ignore),30)
-        part_no = Str2Int(LineDict["PART_NO"],Ignore)
-        PartNumber = Int2BString(part_no,2)
-        Channel = LineDict["CHANNEL"]
-        if part_no == 0:
-            Name = Str2Six(LineDict["SHIP_NAME"],120)
-            Spare = Int2BString(0,8)
-            BigString = MessageID+RepeatIndicator+MMSI+PartNumber+Name+Spare
-            capsule = NMEAencapsulate(BigString, 28)
-
-        if part_no == 1:
-            Type = Int2BString(Str2Int(LineDict["SHIP_TYPE"],Ignore),8)
-            VendorID = Int2BString(0,42)
-            CallSign = Str2Six(LineDict["CALL_SIGN"],42)
-            Dim = Int2BString(0,30)
-            Spare = Int2BString(0,6)
-            BigString = MessageID+RepeatIndicator+MMSI+PartNumber+Type+VendorID+CallSign+Dim+Spare
-            capsule = NMEAencapsulate(BigString, 28)
-
-        aisnmea = 'AIVDM,1,1,,' + Channel + ',' + capsule + ',O'
-
-    checksum = 0
-    for chindex in range(0,len(aisnmea)):
-        checksum = checksum ^ ord(aisnmea[chindex])
-    aisnmea = '!' + aisnmea + '*' + '{:02X}'.format(checksum)
-    aisnmea = aisnmea.strip() + u"\r\n"
-    return aisnmea.encode("utf-8")
+    payload, fill = aismsg.encoders[name](**fields)
+    channel = Str2Str(LineDict.get("CHANNEL", "A"),Ignore)
+    return ''.join(aismsg.sentences(payload, fill, channel)).encode("utf-8")
 
 def parse_line(f):
 
@@ -315,79 +184,156 @@ def parse_line(f):
     return LineDict
 
 
+# compiled encoders of the target reports
+encode_1 = aismsg.encoders['1']
+encode_5 = aismsg.encoders['5']
+encode_18 = aismsg.encoders['18']
+encode_24A = aismsg.encoders['24A']
+encode_24B = aismsg.encoders['24B']
+
 class AISTarget(Target):
-    def __init__(self, mmsi, lat, lon, course, speed, heading):
-        self.mmsi = mmsi
+    def __init__(self, mmsi, lat, lon, course, speed, heading, ship_name = None, call_sign = None, ship_type = 0):
+        self.mmsi = int(mmsi)
         self.heading = heading
+        self.ship_name = ship_name
+        self.call_sign = call_sign
+        self.ship_type = ship_type
         Target.__init__(self, lat, lon, course, speed)
 
 class AISTargetA(AISTarget):
-    def __init__(self, mmsi, lat, lon, course, speed, heading):
-        AISTarget.__init__(self, mmsi, lat, lon, course, speed, heading)
-
-    def nmeaEncode(self):
-        self.update()
-        # format timestamp: "2015-11-19T05:19:47"
-        now = datetime.utcnow()
-        timestamp = now.strftime("%Y-%m-%dT%H%M%S")
-
-        LineDict = { "TYPE":"1",
-                     "MMSI":self.mmsi,
-                     "STATUS":"0",
-                     "SPEED": self.speed,
-                     "LON": self.lon,
-                     "LAT": self.lat,
-                     "COURSE": self.course,
-                     "HEADING": self.heading,
-                     "TIMESTAMP": timestamp }
-        return nmeaEncode(LineDict)
+    access = 'SOTDMA'   # slot access scheme on the VDL (see vdl.py)
+    channel = "A"       # channel of the position reports
+
+    def __init__(self, mmsi, lat, lon, course, speed, heading, status = 0, ship_name = None, call_sign = None, ship_type = 0):
+        AISTarget.__init__(self, mmsi, lat, lon, course, speed, heading, ship_name, call_sign, ship_type)
+        self.status = status
+
+    def report(self, channel = "A"):
+        # https://www.navcen.uscg.gov/?pageName=AISMessagesA
+        # static and voyage related data (type 5) must be sent each 6 minutes
+        if self.ship_name == None or self.call_sign == None:
+            return
+
+        payload, fill = encode_5(mmsi=self.mmsi, call_sign=self.call_sign,
+                                 ship_name=self.ship_name, ship_type=self.ship_type)
+        return ''.join(aismsg.sentences(payload, fill, channel)).encode("utf-8")
+
+    def encodePayload(self, when = None):
+        self.update(when)
+        return encode_1(mmsi=self.mmsi, status=self.status, speed=self.speed,
+                        accuracy=1, lon=self.lon, lat=self.lat, course=self.course,
+                        heading=self.heading, second=self.datetime.second)
+
+    def nmeaEncode(self, channel = None, when = None):
+        payload, fill = self.encodePayload(when)
+        return ''.join(aismsg.sentences(payload, fill, channel or self.channel)).encode("utf-8")
 
 class AISTargetB(AISTarget):
-    def __init__(self, mmsi, lat, lon, course, speed, heading, ship_name = None, call_sign = None):
-        AISTarget.__init__(self, mmsi, lat, lon, course, speed, heading)
-        self.ship_name = ship_name
-        self.call_sign = call_sign
+    access = 'CSTDMA'
+    channel = "B"
 
-    def report(self):
+    def __init__(self, mmsi, lat, lon, course, speed, heading, ship_name = None, call_sign = None, ship_type = 0):
+        AISTarget.__init__(self, mmsi, lat, lon, course, speed, heading, ship_name, call_sign, ship_type)
+
+    def report(self, channel = None, part = None):
         # https://www.navcen.uscg.gov/?pageName=AISMessagesB
         # message part A (0) must be sent each 6 minutes, alternate channel
         # TYPE="24" MMSI="367415980" PART_NO="0" CHANNEL="A" SHIP_NAME="WHISPER"
         # message part B (1) must be sent within 1 min from part A
         # TYPE="24" MMSI="367415980" PART_NO="1" CHANNEL="B" SHIP_TYPE="8" CALL_SIGN="WDE9319"
+        # with part, only that part is sent (the VDL model sends them separately)
 
         if self.ship_name == None or self.call_sign == None:
             return
 
-        LineDict = { "TYPE":"24",
-                     "MMSI":self.mmsi,
-                     "PART_NO": "0",
-                     "CHANNEL": "A",
-                     "SHIP_NAME": self.ship_name }
-        nmeaEncode(LineDict)
-        LineDict = { "TYPE":"24",
-                     "MMSI":self.mmsi,
-                     "PART_NO": "1",
-                     "CHANNEL": "B",
-                     "SHIP_NAME": self.call_sign }
-        nmeaEncode(LineDict)
-
-
-    def nmeaEncode(self):
-        self.update()
-        # format timestamp: "2015-11-19T05:19:47"
-        now = datetime.utcnow()
-        timestamp = now.strftime("%Y-%m-%dT%H%M%S")
-
-        LineDict = { "TYPE":"18",
-                     "MMSI":self.mmsi,
-                     "SPEED": self.speed,
-                     "LON": self.lon,
-                     "LAT": self.lat,
-                     "COURSE": self.course,
-                     "HEADING": self.heading,
-                     "CHANNEL": "B",
-                     "TIMESTAMP": timestamp }
-        return nmeaEncode(LineDict)
+        mess = []
+        if part != 1:
+            payload, fill = encode_24A(mmsi=self.mmsi, ship_name=self.ship_name)
+            mess = mess + aismsg.sentences(payload, fill, channel or "A")
+        if part != 0:
+            payload, fill = encode_24B(mmsi=self.mmsi, ship_type=self.ship_type, call_sign=self.call_sign)
+            mess = mess + aismsg.sentences(payload, fill, channel or "B")
+        return ''.join(mess).encode("utf-8")
+
+    def encodePayload(self, when = None):
+        self.update(when)
+        # class B "CS" unit (carrier sense), fixed communication state
+        return encode_18(mmsi=self.mmsi, speed=self.speed, accuracy=1,
+                         lon=self.lon, lat=self.lat, course=self.course,
+                         heading=self.heading, second=self.datetime.second, cs=1)
+
+    def nmeaEncode(self, channel = None, when = None):
+        payload, fill = self.encodePayload(when)
+        return ''.join(aismsg.sentences(payload, fill, channel or self.channel)).encode("utf-8")
+
+def encode_targets(batch, when = None, channels = None, out = None):
+    # position reports of a batch of targets at the when times (datetime, default
+    # now) on channels (default the target channel): the payloads are encoded
+    # one by one, the sentences and their checksums are formatted together
+    # (nmeafmt.py), in out when given (reused: the messages of the previous
+    # call are overwritten)
+    when = when or [None] * len(batch)
+    channels = channels or [t.channel for t in batch]
+    if nmeafmt == None:
+        return [t.nmeaEncode(c, w) for t, c, w in zip(batch, channels, when)]
+    payloads = []
+    fills = []
+    for t, w in zip(batch, when):
+        payload, fill = t.encodePayload(w)
+        payloads.append(payload)
+        fills.append(fill)
+    return nmeafmt.aivdm(payloads, channels, fills, out)
+
+def fleet_targets(records):
+    # build the targets from scenario records (see traffic.py):
+    # CLASS="A" MMSI="226000001" LAT="48.1" LON="-5.5" COURSE="100.0" SPEED="11.0" HEADING="100" STATUS="0" SHIP_TYPE="70" SHIP_NAME="MV OCEAN 00001" CALL_SIGN="F000001"
+    targets = []
+    for LineDict in records:
+        mmsi = Str2Str(LineDict["MMSI"],Ignore)
+        lat = Str2Float(LineDict["LAT"],Ignore)
+        lon = Str2Float(LineDict["LON"],Ignore)
+        course = Str2Float(LineDict["COURSE"],Ignore)
+        speed = Str2Float(LineDict["SPEED"],Ignore)
+        heading = Str2Int(LineDict["HEADING"],Ignore)
+        if LineDict["CLASS"] == "A":
+            targets.append(AISTargetA(mmsi, lat, lon, course, speed, heading,
+                                      Str2Int(LineDict["STATUS"],Ignore),
+                                      LineDict["SHIP_NAME"], LineDict["CALL_SIGN"],
+                                      Str2Int(LineDict["SHIP_TYPE"],Ignore)))
+        else:
+            targets.append(AISTargetB(mmsi, lat, lon, course, speed, heading,
+                                      LineDict["SHIP_NAME"], LineDict["CALL_SIGN"],
+                                      Str2Int(LineDict["SHIP_TYPE"],Ignore)))
+    return targets
+
+def synthetic_targets(fleet):
+    # build the targets straight from the arrays of a traffic.Fleet
+    targets = []
+    for (class_a, mmsi, lat, lon, course, speed, heading, status,
+         ship_type, ship_name, call_sign) in zip(fleet.class_a.tolist(), fleet.mmsi.tolist(),
+                                                 fleet.lat.tolist(), fleet.lon.tolist(),
+                                                 fleet.course.tolist(), fleet.speed.tolist(),
+                                                 fleet.heading.tolist(), fleet.status.tolist(),
+                                                 fleet.ship_type.tolist(), fleet.ship_name.tolist(),
+                                                 fleet.call_sign.tolist()):
+        if class_a:
+            targets.append(AISTargetA(mmsi, lat, lon, course, speed, heading, status,
+                                      ship_name, call_sign, ship_type))
+        else:
+            targets.append(AISTargetB(mmsi, lat, lon, course, speed, heading,
+                                      ship_name, call_sign, ship_type))
+    return targets
+
+def read_scenario(f):
+    records = []
+    try:
+        while True:
+            LineDict = parse_line(f)
+            if LineDict:
+                records.append(LineDict)
+    except EOFError:
+        pass
+    return records
 
 class connection:
     def __init__(self, host, port):
@@ -469,13 +415,24 @@ def usage():
     print("-t, --TCP                   create TCP connection.")
     print("-u, --UDP                   use connectionless UDP.")
     print("                            UDP is default if no connection type specified.")
+    print("-n, --fleet=#               generate # synthetic vessels (needs numpy).")
+    print("-r, --seed=#                seed of the synthetic traffic generator.")
+    print("-w, --save=FILE             save the synthetic fleet as a scenario file and exit.")
+    print("-f, --scenario=FILE         read the vessels from a scenario file.")
+    print("-v, --vdl                   send the reports at the rate of the VHF data link:")
+    print("                            slots, reporting intervals and collisions.")
+    print("                            The sleep time is then ignored.")
+    print("-j, --workers=#             encode the targets on # threads while sending.")
+    print("-b, --batch=#               targets encoded at a time by a thread (default 100).")
+    print("-a, --archive=PREFIX        also write the messages to gzip archive files")
+    print("                            PREFIX-YYYYmmdd-HHMMSS.nmea.gz, a new file each hour.")
     print("")
     print("If no FILE is given then default is to read input text from STDIN.")
     return
 
 rCode = True
 try:
-    options, remainder = getopt.gnu_getopt(sys.argv[1:], 'hd:p:s:ut', ['help','dest=','port=','sleep=','UDP','TCP'])
+    options, remainder = getopt.gnu_getopt(sys.argv[1:], 'hd:p:s:utn:r:w:f:vj:b:a:', ['help','dest=','port=','sleep=','UDP','TCP','fleet=','seed=','save=','scenario=','vdl','workers=','batch=','archive='])
     
     for opt, arg in options:
         if opt in ('-d', '--dest'):
@@ -488,6 +445,22 @@ try:
             mode = 'UDP'
         elif opt in ('-t', '--TCP'):
             mode = 'TCP'
+        elif opt in ('-n', '--fleet'):
+            fleet = Str2Int(arg,'')
+        elif opt in ('-r', '--seed'):
+            seed = Str2Int(arg,'')
+        elif opt in ('-w', '--save'):
+            save = arg
+        elif opt in ('-f', '--scenario'):
+            scenario = arg
+        elif opt in ('-v', '--vdl'):
+            channelModel = True
+        elif opt in ('-j', '--workers'):
+            workers = Str2Int(arg,'')
+        elif opt in ('-b', '--batch'):
+            batch = Str2Int(arg,'')
+        elif opt in ('-a', '--archive'):
+            archivePrefix = arg
         elif opt in ('-h', '--help'):
             usage()
             sys.exit()
@@ -520,6 +493,22 @@ if rCode == False:
 
 rCode = False
 
+if fleet > 0:
+    import traffic
+    synthetic = traffic.generate(fleet, seed)
+    if save:
+        with open(save, 'w') as f:
+            synthetic.write(f)
+        print(["Scenario saved:", save, str(fleet) + " vessels"])
+        sys.exit()
+    targets = synthetic_targets(synthetic)
+elif scenario:
+    with open(scenario, 'r') as f:
+        targets = fleet_targets(read_scenario(f))
+else:
+    targets = [ AISTargetA("24416300", 48.135410, -005.500, 100.0, 11.0, 100.0),
+                AISTargetB("43331334", to_angle(48.0, 9.3), to_angle(-005.0, 13.9), 45.0, 5.0, 45.0) ]
+
 if mode.upper() == "UDP":
     con = udp(dest,port)
 
@@ -529,20 +518,73 @@ if mode.upper() == "TCP":
          print("TCP connexion error")
          sys.exit()
 
-targets = [ AISTargetA("24416300", 48.135410, -005.500, 100.0, 11.0, 100.0),
-            AISTargetB("43331334", to_angle(48.0, 9.3), to_angle(-005.0, 13.9), 45.0, 5.0, 45.0) ]
+archiveWriter = None
+if archivePrefix:
+    import archive
+    archiveWriter = archive.ArchiveWriter(archivePrefix, rotate_time=archiveRotate)
+
+def output(mess):
+    print(bytes(mess).strip())
+    con.send(mess)
+    if archiveWriter:
+        archiveWriter.write(mess)
+
+# buffer of the sequential loops, their messages are sent before the next batch
+# is encoded (the pipeline batches wait in a queue, they get their own buffer)
+aivdmBuffer = bytearray(nmeafmt.AIVDM_WIDTH * batch) if nmeafmt else None
+
+def encode_sequential(group, when = None, channels = None):
+    return encode_targets(group, when, channels, aivdmBuffer)
+
 print("Type Ctrl-C to exit...")
 
+stages = None
 try:
+    if channelModel:
+        import vdl
+        link = vdl.VDL(targets, time.time(), seed, encode=encode_sequential)
+        nextStats = time.time() + statsInterval
+        while True :
+            for mess in link.step(time.time()):
+                output(mess)
+            if time.time() >= nextStats:
+                nextStats = nextStats + statsInterval
+                for stats in link.stats():
+                    print(['VDL channel ' + stats["channel"],
+                           'utilization: {:.1%}'.format(stats["utilization"]),
+                           'collisions: ' + str(stats["collisions"]),
+                           'sent: ' + str(stats["sent"]),
+                           'lost: ' + str(stats["lost"]),
+                           'dropped: ' + str(stats["dropped"])])
+            time.sleep(vdl.SLOT_TIME)
+    if workers > 0:
+        import pipeline
+        stages = pipeline.Pipeline(targets, output, td, batch, workers, encode=encode_targets)
+        stages.start()
+        while not stages.join(1.0):
+            pass
+        # the pipeline only stops by itself on an error
+        raise stages.error
+    nextTime = time.time()  # send time of the next message
     while True :
-        for t in targets:
-            mess = t.nmeaEncode()
-            print(mess.strip())
-            con.send(mess)
-            time.sleep(td)
+        # batch by batch, each target propagated to its send time
+        for i in range(0, len(targets), batch):
+            group = targets[i:i+batch]
+            start = max(nextTime, time.time())
+            nextTime = start + len(group) * td
+            times = [start + k * td for k in range(len(group))]
+            for mess, when in zip(encode_sequential(group, [datetime.fromtimestamp(t) for t in times]), times):
+                time.sleep(max(0.0, when - time.time()))
+                output(mess)
 except KeyboardInterrupt:
-    con.close()
     rCode = True
+finally:
+    # also on errors (e.g. a broken TCP connexion): the buffered block is archived
+    if stages:
+        stages.stop(wait=True)
+    if archiveWriter:
+        archiveWriter.close()
+    con.close()
 
 #        try:
 #           if LineDict:
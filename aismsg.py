@@ -0,0 +1,299 @@
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#	AIS message layouts.  Each message is declared as a table of fields and
+#	compiled at import into one specialized encode function (and one decode
+#	function) per message, so encoding a report is a few shifts and masks,
+#	without dict lookups or string parsing.
+#
+#	Field: (name, kind, bits, scale, default)
+#	    kind 'u' unsigned, 'i' signed (two's complement), 't' sixbit text,
+#	         'c' constant (not a parameter of the encoder, always default)
+#	    scale: the field holds round(value * scale)
+#	    default: "not available" value, in the same unit as the parameter
+#	Values out of the field range are clamped (e.g. speed 110 kn is sent as
+#	102.2, "102.2 kn or more"), angles out of VALID are sent as not available.
+#
+#	encoders['1'](mmsi=..., lat=..., ...) returns (payload, fill bits)
+#	decode(payload) returns a dict of the fields
+
+# AIS official spec: https://www.itu.int/rec/R-REC-M.1371-5-201402-I/en
+# AIS simplified spec : https://www.navcen.uscg.gov/?pageName=AISMessages
+
+from functools import reduce
+from operator import xor
+
+HEADER = lambda msgtype: [ ('msgtype', 'c', 6, 1, msgtype),
+                           ('repeat', 'u', 2, 1, 0),
+                           ('mmsi', 'u', 30, 1, 0) ]
+
+POSITION = [ ('accuracy', 'u', 1, 1, 0),
+             ('lon', 'i', 28, 600000, 181),
+             ('lat', 'i', 27, 600000, 91) ]
+
+DIMENSIONS = [ ('to_bow', 'u', 9, 1, 0),
+               ('to_stern', 'u', 9, 1, 0),
+               ('to_port', 'u', 6, 1, 0),
+               ('to_starboard', 'u', 6, 1, 0),
+               ('epfd', 'u', 4, 1, 0) ]
+
+MESSAGES = {
+    # Class A position report
+    '1': HEADER(1) + [ ('status', 'u', 4, 1, 15),
+                       ('turn', 'i', 8, 1, -128),
+                       ('speed', 'u', 10, 10, 102.3) ] + POSITION + [
+                       ('course', 'u', 12, 10, 360),
+                       ('heading', 'u', 9, 1, 511),
+                       ('second', 'u', 6, 1, 60),
+                       ('maneuver', 'u', 2, 1, 0),
+                       ('spare', 'c', 3, 1, 0),
+                       ('raim', 'u', 1, 1, 0),
+                       ('radio', 'u', 19, 1, 0) ],
+    # Class A static and voyage related data (2 sentences)
+    '5': HEADER(5) + [ ('ais_version', 'u', 2, 1, 0),
+                       ('imo', 'u', 30, 1, 0),
+                       ('call_sign', 't', 42, 1, ''),
+                       ('ship_name', 't', 120, 1, ''),
+                       ('ship_type', 'u', 8, 1, 0) ] + DIMENSIONS + [
+                       ('month', 'u', 4, 1, 0),
+                       ('day', 'u', 5, 1, 0),
+                       ('hour', 'u', 5, 1, 24),
+                       ('minute', 'u', 6, 1, 60),
+                       ('draught', 'u', 8, 10, 0),
+                       ('destination', 't', 120, 1, ''),
+                       ('dte', 'u', 1, 1, 1),
+                       ('spare', 'c', 1, 1, 0) ],
+    # Class B position report, radio defaults to 1100000000000000110b, the fixed
+    # communication state of a "CS" unit (cs=1)
+    '18': HEADER(18) + [ ('reserved', 'c', 8, 1, 0),
+                         ('speed', 'u', 10, 10, 102.3) ] + POSITION + [
+                         ('course', 'u', 12, 10, 360),
+                         ('heading', 'u', 9, 1, 511),
+                         ('second', 'u', 6, 1, 60),
+                         ('regional', 'u', 2, 1, 0),
+                         ('cs', 'u', 1, 1, 1),
+                         ('display', 'u', 1, 1, 0),
+                         ('dsc', 'u', 1, 1, 0),
+                         ('band', 'u', 1, 1, 0),
+                         ('msg22', 'u', 1, 1, 0),
+                         ('assigned', 'u', 1, 1, 0),
+                         ('raim', 'u', 1, 1, 0),
+                         ('radio', 'u', 20, 1, 393222) ],
+    # Extended class B position report
+    '19': HEADER(19) + [ ('reserved', 'c', 8, 1, 0),
+                         ('speed', 'u', 10, 10, 102.3) ] + POSITION + [
+                         ('course', 'u', 12, 10, 360),
+                         ('heading', 'u', 9, 1, 511),
+                         ('second', 'u', 6, 1, 60),
+                         ('regional', 'u', 4, 1, 0),
+                         ('ship_name', 't', 120, 1, ''),
+                         ('ship_type', 'u', 8, 1, 0) ] + DIMENSIONS + [
+                         ('raim', 'u', 1, 1, 0),
+                         ('dte', 'u', 1, 1, 1),
+                         ('assigned', 'u', 1, 1, 0),
+                         ('spare', 'c', 4, 1, 0) ],
+    # Aid-to-navigation report (without name extension)
+    '21': HEADER(21) + [ ('aid_type', 'u', 5, 1, 0),
+                         ('name', 't', 120, 1, '') ] + POSITION + DIMENSIONS + [
+                         ('second', 'u', 6, 1, 60),
+                         ('off_position', 'u', 1, 1, 0),
+                         ('regional', 'u', 8, 1, 0),
+                         ('raim', 'u', 1, 1, 0),
+                         ('virtual_aid', 'u', 1, 1, 0),
+                         ('assigned', 'u', 1, 1, 0),
+                         ('spare', 'c', 1, 1, 0) ],
+    # Class B static data, part A (0): name
+    '24A': HEADER(24) + [ ('part_no', 'c', 2, 1, 0),
+                          ('ship_name', 't', 120, 1, ''),
+                          ('spare', 'c', 8, 1, 0) ],
+    # Class B static data, part B (1): type, call sign
+    '24B': HEADER(24) + [ ('part_no', 'c', 2, 1, 1),
+                          ('ship_type', 'u', 8, 1, 0),
+                          ('vendor_id', 't', 18, 1, ''),
+                          ('model', 'u', 4, 1, 0),
+                          ('serial', 'u', 20, 1, 0),
+                          ('call_sign', 't', 42, 1, ''),
+                          ('to_bow', 'u', 9, 1, 0),
+                          ('to_stern', 'u', 9, 1, 0),
+                          ('to_port', 'u', 6, 1, 0),
+                          ('to_starboard', 'u', 6, 1, 0),
+                          ('spare', 'c', 6, 1, 0) ],
+    # Long range broadcast: 1/10 minute position, speed in knots, course in degres
+    '27': HEADER(27) + [ ('accuracy', 'u', 1, 1, 0),
+                         ('raim', 'u', 1, 1, 0),
+                         ('status', 'u', 4, 1, 15),
+                         ('lon', 'i', 18, 600, 181),
+                         ('lat', 'i', 17, 600, 91),
+                         ('speed', 'u', 6, 1, 63),
+                         ('course', 'u', 9, 1, 511),
+                         ('gnss', 'u', 1, 1, 0),
+                         ('spare', 'c', 1, 1, 0) ],
+}
+
+# ais NMEA payload armoring: 6 bits value <-> character
+ARMOR = ''.join(chr(v + 48) if v < 40 else chr(v + 56) for v in range(64))
+UNARMOR = dict((c, v) for v, c in enumerate(ARMOR))
+
+# Sixbit ASCII: '@' (0) to '_' (31), then ' ' (32) to '?' (63)
+SIXBIT = ''.join(chr(v + 64) if v < 32 else chr(v) for v in range(64))
+SIXBIT_VALUE = dict((c, v) for v, c in enumerate(SIXBIT))
+
+def text2int(text, chars):
+    """
+    Sixbit encoding of a text, padded with '@' or truncated to chars characters
+    Unknown characters are sent as '?'
+    """
+    value = 0
+    text = text.upper()[:chars]
+    for c in text:
+        value = (value << 6) | SIXBIT_VALUE.get(c, 63)
+    return value << (6 * (chars - len(text)))
+
+def int2text(value, chars):
+    """
+    Sixbit decoding, trailing '@' and spaces removed
+    """
+    text = ''.join(SIXBIT[(value >> (6 * i)) & 63] for i in range(chars - 1, -1, -1))
+    return text.split('@')[0].rstrip()
+
+# valid range [low, high) of the angles, other values are sent as "not available"
+VALID = { 'lon': (-180, 180.0001),
+          'lat': (-90, 90.0001),
+          'course': (0, 360),
+          'heading': (0, 360) }
+# rounded up to a full turn: 0
+WRAP = { 'course': 360 }
+
+def compile_encoder(name, fields):
+    """
+    Builds the specialized encode function of a message table
+    """
+    params = []
+    body = ['    v = 0']
+    nbits = 0
+    for fname, kind, bits, scale, default in fields:
+        nbits = nbits + bits
+        mask = (1 << bits) - 1
+        if kind == 'c':
+            body.append('    v = (v << %d) | %d' % (bits, default & mask))
+            continue
+        params.append('%s=%r' % (fname, default))
+        if kind == 't':
+            body.append('    v = (v << %d) | text2int(%s, %d)' % (bits, fname, bits // 6))
+            continue
+        if scale == 1:
+            body.append('    x = int(%s)' % fname)
+        else:
+            body.append('    x = int(round(%s * %r))' % (fname, scale))
+        raw = int(round(default * scale))
+        if fname in VALID:
+            # out of the valid range: not available
+            low, high = VALID[fname]
+            if fname in WRAP:
+                body.append('    x = x %% %d' % (WRAP[fname] * scale))
+            body.append('    if not %r <= %s < %r: x = %d' % (low, fname, high, raw))
+        else:
+            # clamp to the field range, the "not available" value at its end is
+            # only sent as the default (e.g. speed 102.3)
+            low, high = (-(1 << (bits - 1)), (1 << (bits - 1)) - 1) if kind == 'i' else (0, mask)
+            if raw == high and raw != 0:
+                high = high - 1
+            if raw == low and kind == 'i':
+                low = low + 1
+            body.append('    if x != %d:' % raw)
+            body.append('        if x < %d: x = %d' % (low, low))
+            body.append('        elif x > %d: x = %d' % (high, high))
+        body.append('    v = (v << %d) | (x & %d)' % (bits, mask))
+    fill = -nbits % 6
+    shifts = tuple(range(nbits + fill - 6, -1, -6))
+    body.append('    v = v << %d' % fill)
+    body.append('    return \'\'.join([ARMOR[(v >> s) & 63] for s in %r]), %d' % (shifts, fill))
+    source = 'def encode_%s(%s):\n%s\n' % (name, ', '.join(params), '\n'.join(body))
+    namespace = {'ARMOR': ARMOR, 'text2int': text2int}
+    exec(source, namespace)
+    return namespace['encode_' + name]
+
+def compile_decoder(name, fields):
+    """
+    Builds the specialized decode function of a message table: int value of
+    the payload (without fill bits) -> dict
+    """
+    body = ['    d = {}']
+    shift = sum(field[2] for field in fields)
+    for fname, kind, bits, scale, default in fields:
+        shift = shift - bits
+        mask = (1 << bits) - 1
+        if fname == 'spare':
+            continue
+        if kind == 't':
+            body.append('    d[%r] = int2text((v >> %d) & %d, %d)' % (fname, shift, mask, bits // 6))
+            continue
+        body.append('    x = (v >> %d) & %d' % (shift, mask))
+        if kind == 'i':
+            body.append('    if x >= %d: x = x - %d' % (1 << (bits - 1), 1 << bits))
+        if scale == 1:
+            body.append('    d[%r] = x' % fname)
+        else:
+            body.append('    d[%r] = x / %r' % (fname, float(scale)))
+    body.append('    return d')
+    source = 'def decode_%s(v):\n%s\n' % (name, '\n'.join(body))
+    namespace = {'int2text': int2text}
+    exec(source, namespace)
+    return namespace['decode_' + name]
+
+encoders = dict((name, compile_encoder(name, fields)) for name, fields in MESSAGES.items())
+decoders = dict((name, compile_decoder(name, fields)) for name, fields in MESSAGES.items())
+sizes = dict((name, sum(field[2] for field in fields)) for name, fields in MESSAGES.items())
+
+def decode(payload, fill = 0):
+    """
+    Decodes a (reassembled) payload into a dict of fields
+    """
+    v = 0
+    for c in payload:
+        v = (v << 6) | UNARMOR[c]
+    nbits = 6 * len(payload) - fill
+    v = v >> fill
+    msgtype = v >> (nbits - 6)
+    name = str(msgtype)
+    if msgtype == 24:
+        name = '24B' if (v >> (nbits - 40)) & 3 else '24A'
+    if name not in decoders:
+        raise ValueError("Unsupported message type " + name)
+    v = v >> (nbits - sizes[name])    # ignore extra bits (e.g. type 21 name extension)
+    return decoders[name](v)
+
+def checksum(sentence):
+    """
+    NMEA checksum: XOR of all characters between '!' and '*'
+    """
+    return reduce(xor, bytearray(sentence.encode('ascii')), 0)
+
+sequence = [0]  # sequential message id of multi sentence messages, 0 to 9
+
+def sentences(payload, fill, channel = 'A'):
+    """
+    Wraps a payload into AIVDM sentences (at most 60 payload characters each)
+    Returns a list of sentences with '!', checksum and CR LF
+    """
+    chunks = [payload[i:i+60] for i in range(0, len(payload), 60)] or ['']
+    count = len(chunks)
+    seqid = ''
+    if count > 1:
+        seqid = str(sequence[0])
+        sequence[0] = (sequence[0] + 1) % 10
+    result = []
+    for index, chunk in enumerate(chunks):
+        bits = fill if index == count - 1 else 0
+        body = 'AIVDM,%d,%d,%s,%s,%s,%d' % (count, index + 1, seqid, channel, chunk, bits)
+        result.append('!' + body + '*' + '{:02X}'.format(checksum(body)) + '\r\n')
+    return result
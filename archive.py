@@ -0,0 +1,278 @@
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#	Compressed NMEA archive.  Sentences are written in blocks of up to a few
+#	MB or a minute, each block compressed on its own (a gzip member or a
+#	zstd frame, at a fast level), so the archive is still a valid .gz/.zst
+#	file (zcat works) and any block can be decompressed alone.  Files are
+#	rotated by size or time.  Next to each
+#	file, an index (.idx) has one line per block:
+#	    offset length first_time last_time mmsi_min mmsi_max sentences
+#	scan() uses the index to skip blocks out of the time or MMSI range and
+#	decompresses the others in parallel on a process pool.
+#
+#	    python archive.py [-j workers] [-m mmsi] [-s start] [-e end] FILE...
+#	prints the sentences of archive files (times in seconds since epoch).
+
+import gzip
+import os
+import sys
+import time
+import getopt
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+import aismsg
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+EXTENSIONS = { 'gzip': '.nmea.gz', 'zstd': '.nmea.zst' }
+# compression levels: fast enough for the sender thread (gzip 9 takes ~0.3 S per 4 MB)
+LEVELS = { 'gzip': 1, 'zstd': 3 }
+
+def sentence_mmsi(sentence):
+    """
+    MMSI of a !AIVDM sentence, None for the following parts of a multi
+    sentence message (or any other sentence)
+    """
+    fields = sentence.split(b',')
+    if len(fields) < 7 or fields[2] != b'1' or len(fields[5]) < 7:
+        return None
+    v = 0
+    for c in fields[5][:7].decode('ascii'):
+        v = (v << 6) | aismsg.UNARMOR[c]
+    return (v >> 4) & 0x3FFFFFFF   # 42 bits: type 6, repeat 2, mmsi 30, 4 more
+
+def compress(data, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdCompressor(level=LEVELS['zstd']).compress(data)
+    return gzip.compress(data, compresslevel=LEVELS['gzip'])
+
+def decompress(data, compression):
+    if compression == 'zstd':
+        return zstandard.ZstdDecompressor().decompress(data)
+    return gzip.decompress(data)
+
+class ArchiveWriter:
+    def __init__(self, prefix, compression='gzip', block_size=4000000, block_time=60.0,
+                 rotate_size=1000000000, rotate_time=86400.0):
+        """
+        Construct a new 'ArchiveWriter' object.
+
+        Parameters
+        ----------
+        prefix: str
+          path and start of the file names: prefix-YYYYmmdd-HHMMSS.nmea.gz
+        compression: str
+          'gzip' or 'zstd' (needs the zstandard module)
+        block_size: int
+          uncompressed size of a block in bytes
+        block_time: float
+          age of a block before it is written, in seconds
+        rotate_size: int
+          compressed size of a file before a new one is started, in bytes
+        rotate_time: float
+          age of a file before a new one is started, in seconds
+        """
+        if compression not in EXTENSIONS:
+            raise ValueError("Unknown compression " + compression)
+        if compression == 'zstd' and zstandard == None:
+            raise ValueError("zstd compression needs the zstandard module")
+        self.prefix = prefix
+        self.compression = compression
+        self.block_size = block_size
+        self.block_time = block_time
+        self.rotate_size = rotate_size
+        self.rotate_time = rotate_time
+        self.file = None
+        self.index = None
+        self.opened = None
+        self.reset()
+
+    def reset(self):
+        self.block = []
+        self.size = 0
+        self.count = 0          # sentences
+        self.first = None
+        self.last = None
+        self.mmsi_min = None
+        self.mmsi_max = None
+
+    def open(self, now):
+        name = self.prefix + time.strftime("-%Y%m%d-%H%M%S", time.gmtime(now)) + EXTENSIONS[self.compression]
+        self.file = open(name, 'ab')
+        self.index = open(name + '.idx', 'a')
+        self.opened = now
+        self.name = name
+
+    def write(self, mess, now=None):
+        """
+        Adds an encoded message (one or more sentences with CR LF, bytes or
+        memoryview) to the archive
+        """
+        if now == None:
+            now = time.time()
+        if self.first != None:
+            # the block is written when it is too old or would end after the
+            # rotation time of its file
+            opened = self.opened if self.file != None else self.first
+            if (now - self.first >= self.block_time
+                or self.first - opened < self.rotate_time <= now - opened):
+                self.flush()
+        if self.first == None:
+            self.first = now
+        self.last = now
+        data = bytes(mess)      # a memoryview can be overwritten before the block is written
+        sentences = data.splitlines()
+        for sentence in sentences:
+            mmsi = sentence_mmsi(sentence)
+            if mmsi != None:
+                if self.mmsi_min == None or mmsi < self.mmsi_min:
+                    self.mmsi_min = mmsi
+                if self.mmsi_max == None or mmsi > self.mmsi_max:
+                    self.mmsi_max = mmsi
+        self.block.append(data)
+        self.size = self.size + len(data)
+        self.count = self.count + len(sentences)
+        if self.size >= self.block_size:
+            self.flush()
+
+    def flush(self):
+        """
+        Compresses and writes the current block, rotates the file if needed
+        """
+        if not self.block:
+            return
+        if self.file != None and (self.file.tell() >= self.rotate_size
+                                  or self.first - self.opened >= self.rotate_time):
+            self.close_file()
+        if self.file == None:
+            self.open(self.first)
+        data = compress(b''.join(self.block), self.compression)
+        offset = self.file.tell()
+        self.file.write(data)
+        self.file.flush()
+        self.index.write("%d %d %.3f %.3f %d %d %d\n" % (offset, len(data), self.first, self.last,
+                                                       self.mmsi_min or 0, self.mmsi_max or 0,
+                                                       self.count))
+        self.index.flush()
+        self.reset()
+
+    def close_file(self):
+        self.file.close()
+        self.index.close()
+        self.file = None
+        self.index = None
+
+    def close(self):
+        self.flush()
+        if self.file != None:
+            self.close_file()
+
+def read_index(name):
+    """
+    Returns the blocks of an archive file:
+    list of (offset, length, first, last, mmsi_min, mmsi_max, sentences)
+    """
+    blocks = []
+    with open(name + '.idx', 'r') as f:
+        for line in f:
+            fields = line.split()
+            if len(fields) == 7:
+                blocks.append((int(fields[0]), int(fields[1]), float(fields[2]), float(fields[3]),
+                               int(fields[4]), int(fields[5]), int(fields[6])))
+    return blocks
+
+def scan_block(name, offset, length, mmsi):
+    # worker: decompress one block and filter it
+    compression = 'zstd' if name.endswith(EXTENSIONS['zstd']) else 'gzip'
+    with open(name, 'rb') as f:
+        f.seek(offset)
+        data = decompress(f.read(length), compression)
+    if mmsi == None:
+        return data.splitlines(True)
+    result = []
+    keep = False
+    for sentence in data.splitlines(True):
+        fields = sentence.split(b',', 3)
+        if len(fields) > 2 and fields[2] == b'1':
+            keep = sentence_mmsi(sentence) == mmsi
+        if keep:
+            result.append(sentence)
+    return result
+
+def scan(names, mmsi=None, start=None, end=None, workers=None):
+    """
+    Yields the sentences of archive files, in order, keeping only the blocks
+    that may hold sentences of mmsi between the start and end times
+    (seconds since epoch) and, with mmsi, the sentences of that MMSI
+    """
+    jobs = []
+    for name in names:
+        for offset, length, first, last, mmsi_min, mmsi_max, count in read_index(name):
+            if start != None and last < start:
+                continue
+            if end != None and first > end:
+                continue
+            if mmsi != None and not (mmsi_min <= mmsi <= mmsi_max):
+                continue
+            jobs.append((name, offset, length))
+    # at most 2 blocks per worker decompressed ahead of the reader
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        ahead = 2 * (workers or os.cpu_count() or 1)
+        futures = deque()
+        for name, offset, length in jobs:
+            futures.append(pool.submit(scan_block, name, offset, length, mmsi))
+            if len(futures) >= ahead:
+                for sentence in futures.popleft().result():
+                    yield sentence
+        while futures:
+            for sentence in futures.popleft().result():
+                yield sentence
+
+def usage():
+    print("Usage: python archive.py [OPTION]... FILE...")
+    print("Print the NMEA sentences of archive files.")
+    print("")
+    print("-h, --help                  this message.")
+    print("-j, --workers=#             number of decompression processes.")
+    print("-m, --mmsi=#                only the sentences of this MMSI.")
+    print("-s, --start=#               blocks ending after this time (seconds since epoch).")
+    print("-e, --end=#                 blocks starting before this time (seconds since epoch).")
+
+if __name__ == '__main__':
+    try:
+        options, remainder = getopt.gnu_getopt(sys.argv[1:], 'hj:m:s:e:', ['help','workers=','mmsi=','start=','end='])
+    except getopt.GetoptError:
+        usage()
+        sys.exit(1)
+    workers = mmsi = start = end = None
+    for opt, arg in options:
+        if opt in ('-j', '--workers'):
+            workers = int(arg)
+        elif opt in ('-m', '--mmsi'):
+            mmsi = int(arg)
+        elif opt in ('-s', '--start'):
+            start = float(arg)
+        elif opt in ('-e', '--end'):
+            end = float(arg)
+        elif opt in ('-h', '--help'):
+            usage()
+            sys.exit()
+    if not remainder:
+        usage()
+        sys.exit(1)
+    out = getattr(sys.stdout, 'buffer', sys.stdout)
+    for sentence in scan(remainder, mmsi, start, end, workers):
+        out.write(sentence)
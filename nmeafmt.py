@@ -0,0 +1,221 @@
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#	Batch NMEA formatting.  A Layout is a row template with fixed width
+#	fields, e.g. "$GPRMC,{time},A,{lat},{ns},..*{cs}\r\n".  render() fills
+#	the fields of n rows at once from numpy arrays (one row per target or
+#	per epoch), computes the XOR checksum of every sentence of the row with
+#	a reduce over the byte columns, and writes the rows in a preallocated
+#	bytearray.  Numbers are zero padded, so all rows have the same width.
+
+import numpy as np
+
+ZERO = ord('0')
+HEX = np.frombuffer(b'0123456789ABCDEF', dtype=np.uint8)
+
+# field widths of the layouts
+WIDTHS = { 'time': 9,       # hhmmss.ss
+           'date': 6,       # ddmmyy
+           'lat': 8,        # ddmm.mmm
+           'ns': 1,
+           'lon': 9,        # dddmm.mmm
+           'ew': 1,
+           'speed': 5,      # knots 000.0
+           'course': 5,     # degres 000.0
+           'channel': 1,
+           'fill': 1,
+           'cs': 2 }
+
+class Layout:
+    def __init__(self, template, widths=WIDTHS):
+        """
+        Construct a new 'Layout' object.
+
+        Parameters
+        ----------
+        template: str
+          one or more sentences, fields as {name}, checksums as {cs}
+        widths: dict
+          width of each field
+        """
+        self.fields = {}        # name -> list of columns
+        self.checksums = []     # (first column, '*' column) of each sentence
+        row = []
+        start = 0
+        rest = template
+        while rest:
+            if rest[0] in '$!':
+                start = len(row) + 1
+            if rest[0] == '{':
+                name, rest = rest[1:].split('}', 1)
+                if name == 'cs':
+                    self.checksums.append((start, len(row) - 1))
+                else:
+                    self.fields.setdefault(name, []).append(len(row))
+                row.extend('0' * widths[name])
+                continue
+            row.append(rest[0])
+            rest = rest[1:]
+        self.width = len(row)
+        self.template = np.frombuffer(''.join(row).encode('ascii'), dtype=np.uint8)
+
+    def render(self, values, out=None, offset=0):
+        """
+        Formats n rows. values: field name -> uint8 array (n, width) (see the
+        field functions below). The rows are written in out (bytearray) from
+        offset, a new bytearray is allocated without out.
+        Returns the bytearray
+        """
+        n = len(next(iter(values.values())))
+        size = n * self.width
+        if out == None:
+            out = bytearray(offset + size)
+        rows = np.frombuffer(out, dtype=np.uint8, count=size, offset=offset).reshape(n, self.width)
+        rows[:] = self.template
+        for name, columns in self.fields.items():
+            field = values[name]
+            for column in columns:
+                rows[:, column:column + field.shape[1]] = field
+        for first, star in self.checksums:
+            cs = np.bitwise_xor.reduce(rows[:, first:star], axis=1)
+            rows[:, star + 1] = HEX[cs >> 4]
+            rows[:, star + 2] = HEX[cs & 15]
+        return out
+
+def digits(values, width):
+    """
+    Zero padded decimal digits of an int array: uint8 array (n, width)
+    """
+    values = np.asarray(values, dtype=np.int64)
+    powers = 10 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    return ((values[:, None] // powers) % 10 + ZERO).astype(np.uint8)
+
+def chars(values):
+    """
+    One character field from a list or array of characters: uint8 array (n, 1)
+    """
+    return np.frombuffer(''.join(values).encode('ascii'), dtype=np.uint8).reshape(-1, 1)
+
+def fixed(values, width, decimals):
+    """
+    Zero padded fixed point number, e.g. fixed(5.0, 5, 1) = 005.0
+    """
+    scaled = np.round(np.abs(np.asarray(values, dtype=float)) * 10 ** decimals).astype(np.int64)
+    d = digits(scaled, width - 1)
+    dot = np.full((len(d), 1), ord('.'), dtype=np.uint8)
+    return np.hstack((d[:, :width - 1 - decimals], dot, d[:, width - 1 - decimals:]))
+
+def coordinate(deg, degwidth):
+    """
+    Absolute value of an angle as d..dmm.mmm (degwidth digits of degres)
+    The minutes are rounded first, so 59.9999' gives the next degre.
+    """
+    thousandths = np.round(np.abs(np.asarray(deg, dtype=float)) * 60000.0).astype(np.int64)
+    d = digits(thousandths // 60000 * 100000 + thousandths % 60000, degwidth + 5)
+    dot = np.full((len(d), 1), ord('.'), dtype=np.uint8)
+    return np.hstack((d[:, :degwidth + 2], dot, d[:, degwidth + 2:]))
+
+def latitude(lat):
+    """
+    ddmm.mmm and N/S fields of signed latitudes
+    """
+    lat = np.asarray(lat, dtype=float)
+    return coordinate(lat, 2), np.where(lat < 0, ord('S'), ord('N')).astype(np.uint8).reshape(-1, 1)
+
+def longitude(lon):
+    """
+    dddmm.mmm and E/W fields of signed longitudes
+    """
+    lon = np.asarray(lon, dtype=float)
+    return coordinate(lon, 3), np.where(lon < 0, ord('W'), ord('E')).astype(np.uint8).reshape(-1, 1)
+
+def utc_time(t):
+    """
+    hhmmss.ss of times in seconds since epoch
+    """
+    hundredths = np.round(np.asarray(t, dtype=float) % 86400.0 * 100.0).astype(np.int64) % 8640000
+    hhmmss = hundredths // 360000 * 10000 + hundredths // 6000 % 60 * 100 + hundredths // 100 % 60
+    return np.hstack((digits(hhmmss, 6), np.full((len(hhmmss), 1), ord('.'), dtype=np.uint8),
+                      digits(hundredths % 100, 2)))
+
+def utc_date(t):
+    """
+    ddmmyy of times in seconds since epoch
+    """
+    days = (np.asarray(t, dtype=float) // 86400.0).astype('datetime64[D]')
+    year = days.astype('datetime64[Y]')
+    month = days.astype('datetime64[M]')
+    dd = (days - month).astype(np.int64) + 1
+    mm = (month - year).astype(np.int64) + 1
+    yy = (year.astype(np.int64) + 1970) % 100
+    return digits(dd * 10000 + mm * 100 + yy, 6)
+
+# GPS ownship: position fix, satellites and recommended minimum data of one epoch
+GPS = Layout("$GPGGA,{time},{lat},{ns},{lon},{ew},1,04,2.6,100.00,M,-33.9,M,,0000*{cs}\r\n"
+             "$GPGSA,A,3,01,02,03,04,05,06,07,08,09,10,11,12,1.0,1.0,1.0*{cs}\r\n"
+             "$GPRMC,{time},A,{lat},{ns},{lon},{ew},{speed},{course},{date},0.0,E*{cs}\r\n")
+
+def gps(t, lat, lon, speed, course, out=None):
+    """
+    GGA, GSA and RMC sentences of n epochs (arrays of times in seconds since
+    epoch, signed positions in degres, speeds in knots and courses in degres)
+    Returns the bytearray, GPS.width bytes per epoch
+    """
+    lat, ns = latitude(lat)
+    lon, ew = longitude(lon)
+    return GPS.render({ 'time': utc_time(t),
+                        'date': utc_date(t),
+                        'lat': lat, 'ns': ns,
+                        'lon': lon, 'ew': ew,
+                        'speed': fixed(speed, 5, 1),
+                        'course': fixed(np.round(np.asarray(course, dtype=float) * 10.0) % 3600 / 10.0, 5, 1) }, out)
+
+aivdm_layouts = {}   # payload length -> Layout
+AIVDM_WIDTH = 60 + 21   # longest single sentence AIVDM message
+
+def aivdm(payloads, channels, fills, out=None):
+    """
+    Single sentence AIVDM messages of n payloads (payloads of up to 60
+    characters, channels and fill bits). The messages are written in out
+    (bytearray, up to AIVDM_WIDTH bytes per message) when it is large
+    enough, in a new bytearray otherwise, grouped by payload length.
+    Returns the list of messages in payload order, memoryview slices of the
+    buffer (bytes(m) when bytes methods are needed): the next call with the
+    same out overwrites them
+    """
+    n = len(payloads)
+    lengths = np.array([len(p) for p in payloads], dtype=np.int64)
+    if n and lengths.max() > 60:
+        raise ValueError("Payload too long for a single sentence")
+    size = int((lengths + 21).sum())
+    if out == None or len(out) < size:
+        out = bytearray(size)
+    view = memoryview(out)
+    channel = chars(channels)
+    fill = digits(fills, 1)
+    messages = [None] * n
+    offset = 0
+    for length in np.unique(lengths):
+        if length not in aivdm_layouts:
+            aivdm_layouts[length] = Layout("!AIVDM,1,1,,{channel},{payload},{fill}*{cs}\r\n",
+                                           dict(WIDTHS, payload=int(length)))
+        layout = aivdm_layouts[length]
+        group = np.nonzero(lengths == length)[0]
+        payload = np.frombuffer(''.join([payloads[i] for i in group]).encode('ascii'),
+                                dtype=np.uint8).reshape(len(group), length)
+        layout.render({ 'channel': channel[group],
+                        'payload': payload,
+                        'fill': fill[group] }, out, offset)
+        for i in group.tolist():
+            messages[i] = view[offset:offset + layout.width]
+            offset = offset + layout.width
+    return messages
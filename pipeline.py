@@ -0,0 +1,152 @@
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#	Pipelined target output.  Two stages connected by a bounded queue:
+#	    producer: plans the send time of each message (one each delay),
+#	        propagates the targets to their send time and encodes them by
+#	        batches on a pool of worker threads (up to workers + depth
+#	        batches in flight), and queues the encoded batches in target
+#	        order.
+#	    sender: drains the queue and sends each message at its planned time.
+#	The queue holds at most depth batches (2 = double buffering): when the
+#	sender is late the producer waits, when an encode is slow the sender
+#	still has a ready batch to send.  As the positions are those of the send
+#	time, the time spent in the queue does not make them stale.
+
+import threading
+import time
+from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+
+try:
+    import queue
+except ImportError:
+    import Queue as queue   # python 2
+
+def encode_batch(batch, when):
+    return [t.nmeaEncode(when=w) for t, w in zip(batch, when)]
+
+class Pipeline:
+    def __init__(self, targets, send, delay, batch=100, workers=2, depth=2, encode=encode_batch):
+        """
+        Construct a new 'Pipeline' object.
+
+        Parameters
+        ----------
+        targets: list
+          targets with a nmeaEncode() method, sent in turn forever
+        send: function
+          called with each encoded message by the sender thread
+        delay: float
+          time between two messages in seconds
+        batch: int
+          number of targets encoded by a worker at a time
+        workers: int
+          number of encoder threads
+        depth: int
+          number of encoded batches waiting for the sender
+        encode: function
+          encodes a list of targets at a list of send times (datetime) into
+          a list of messages
+        """
+        self.batches = [targets[i:i+batch] for i in range(0, len(targets), batch)]
+        self.send = send
+        self.delay = delay
+        self.workers = workers
+        self.depth = depth
+        self.encode = encode
+        self.ready = queue.Queue(maxsize=depth)
+        self.planned = None     # send time of the next message to encode
+        self.stopped = threading.Event()
+        self.error = None
+        self.threads = [threading.Thread(target=self.produce),
+                        threading.Thread(target=self.drain)]
+        for thread in self.threads:
+            thread.daemon = True
+
+    def start(self):
+        for thread in self.threads:
+            thread.start()
+
+    def stop(self, wait=False):
+        """
+        Stops both stages, with wait until their threads have ended
+        """
+        self.stopped.set()
+        if wait:
+            for thread in self.threads:
+                if thread.is_alive():
+                    thread.join()
+
+    def alive(self):
+        return not self.stopped.is_set()
+
+    def put(self, item):
+        # blocking put that gives up when the pipeline is stopped
+        while self.alive():
+            try:
+                self.ready.put(item, timeout=0.1)
+                return
+            except queue.Full:
+                pass
+
+    def plan(self, n):
+        # send times of the next n messages, from now when the sender is late
+        start = max(self.planned or 0.0, time.time())
+        self.planned = start + n * self.delay
+        return [start + i * self.delay for i in range(n)]
+
+    def produce(self):
+        # every worker busy while depth batches wait for the sender; a batch is
+        # in flight at most once: the window is not larger than the number of batches
+        window = deque()
+        size = min(self.workers + self.depth, len(self.batches))
+        pool = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            index = 0
+            while self.alive():
+                if len(window) == size:
+                    future, times = window.popleft()
+                    self.put(list(zip(future.result(), times)))
+                batch = self.batches[index]
+                times = self.plan(len(batch))
+                window.append((pool.submit(self.encode, batch, [datetime.fromtimestamp(t) for t in times]),
+                               times))
+                index = (index + 1) % len(self.batches)
+        except Exception as e:
+            self.error = e
+            self.stop()
+        finally:
+            pool.shutdown(wait=False)
+
+    def drain(self):
+        try:
+            while self.alive():
+                try:
+                    messages = self.ready.get(timeout=0.1)
+                except queue.Empty:
+                    continue
+                for mess, when in messages:
+                    if self.stopped.wait(max(0.0, when - time.time())):
+                        return
+                    self.send(mess)
+        except Exception as e:
+            self.error = e
+            self.stop()
+
+    def join(self, timeout=None):
+        """
+        Waits until the pipeline is stopped (by stop() or an error)
+        Returns False on timeout
+        """
+        return self.stopped.wait(timeout)
@@ -40,14 +40,14 @@ class Target:
     self.course = course
     self.speed = speed
     self.datetime = datetime.now()
-  def update(self):
+  def update(self, when=None):
     """
     Updates the position since last update
-    uses the real time difference
+    uses the real time difference, or the time difference to when (datetime)
     """
     lat_a = self.lat
     lon_a = self.lon
-    new_time = datetime.now()
+    new_time = when or datetime.now()
     dur = (new_time - self.datetime).total_seconds()
     lat_b = lat_a + (self.speed * (dur/3600.0)
                       * math.cos(math.radians(self.course))
@@ -0,0 +1,240 @@
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#	Synthetic traffic generator.  Builds a fleet of N vessels (up to millions)
+#	with a seeded random generator, everything computed with numpy arrays.
+#	Vessels are spread along shipping lanes (two way traffic) and around ports
+#	(moored or at anchor).  The fleet can be saved as a scenario file, one
+#	vessel per line in the same KEY="value" format as the AIS data files, and
+#	read back by ais.py (--scenario) or given directly to the simulator (--fleet).
+
+import math
+import numpy as np
+
+# Shipping lanes: (start lat, start lon, end lat, end lon, half width in NM, weight)
+# Default lanes are around the Ouessant traffic separation scheme.
+DEFAULT_LANES = [ (49.60, -6.30, 47.60, -5.60, 3.0, 4.0),    # Ouessant TSS south bound
+                  (47.70, -5.40, 49.70, -6.00, 3.0, 4.0),    # Ouessant TSS north bound
+                  (48.35, -4.60, 48.30, -5.40, 1.0, 1.0),    # Brest approach (Goulet)
+                  (47.70, -3.50, 47.90, -5.00, 2.0, 1.0) ]   # Lorient / Concarneau coastal
+
+# Ports: (lat, lon, radius in NM, weight)
+DEFAULT_PORTS = [ (48.38, -4.49, 1.5, 3.0),     # Brest
+                  (47.73, -3.37, 1.0, 1.0),     # Lorient
+                  (47.87, -3.92, 0.7, 1.0),     # Concarneau
+                  (48.72, -3.97, 1.0, 1.0) ]    # Roscoff
+
+# Maritime Identification Digits used for the MMSIs (France, UK, Spain, Netherlands,
+# Germany, Norway, Malta, Liberia, Panama)
+DEFAULT_MIDS = [226, 227, 228, 232, 224, 244, 211, 257, 248, 636, 351]
+
+# Ship types: (AIS ship type, weight, class A ratio, speed mean, speed std, name prefix)
+# speed mean and std in knots for a vessel under way
+SHIP_TYPES = [ (30, 2.0, 0.40,  6.0, 2.5, 'FV'),          # fishing
+               (36, 1.5, 0.02,  5.5, 1.5, 'SY'),          # sailing
+               (37, 2.0, 0.01,  8.0, 4.0, 'MY'),          # pleasure craft
+               (52, 0.5, 0.95,  8.0, 3.0, 'TUG'),         # tug
+               (60, 0.7, 1.00, 17.0, 3.0, 'MV'),          # passenger
+               (70, 3.0, 1.00, 13.0, 2.0, 'MV'),          # cargo
+               (80, 1.3, 1.00, 12.0, 1.5, 'MT') ]         # tanker
+
+# Navigation status (type 1) for class A vessels under way, by ship type
+# (status, probability); tugs under way are towing, fishing vessels are engaged in fishing
+UNDERWAY_STATUS = { 30: [(7, 0.7), (0, 0.3)],
+                    52: [(0, 0.6), (11, 0.3), (12, 0.1)],
+                    36: [(8, 1.0)] }
+
+NOT_AVAILABLE_STATUS = 15   # class B vessels do not send a navigation status
+
+NAME_WORDS = ['ARMOR', 'BREIZH', 'IROISE', 'OUESSANT', 'MOLENE', 'SEIN', 'GLENAN',
+              'ATLANTIC', 'NORDIC', 'OCEAN', 'STAR', 'SPIRIT', 'PIONEER', 'EXPRESS',
+              'TRADER', 'CARRIER', 'VENTURE', 'HORIZON', 'ALBATROS', 'CORMORAN']
+
+BASE36 = np.array(list('0123456789ABCDEFGHIJKLMNOPQRSTUVWXYZ'))
+
+class Fleet:
+    def __init__(self, mmsi, class_a, lat, lon, course, speed, heading, status,
+                 ship_type, ship_name, call_sign):
+        """
+        Construct a new 'Fleet' object. All parameters are numpy arrays of the
+        same length, one entry per vessel.
+
+        Parameters
+        ----------
+        mmsi: int array
+          unique MMSI numbers
+        class_a: bool array
+          True for class A vessels, False for class B
+        lat, lon: float arrays
+          position in degres. Positive north and east
+        course: float array
+          course over ground in degres
+        speed: float array
+          speed in knots, rounded to 1/10 knot
+        heading: int array
+          true heading in degres
+        status: int array
+          navigation status (15 for class B)
+        ship_type: int array
+          AIS ship type
+        ship_name, call_sign: str arrays
+          sixbit compatible names and call signs, unique
+        """
+        self.mmsi = mmsi
+        self.class_a = class_a
+        self.lat = lat
+        self.lon = lon
+        self.course = course
+        self.speed = speed
+        self.heading = heading
+        self.status = status
+        self.ship_type = ship_type
+        self.ship_name = ship_name
+        self.call_sign = call_sign
+
+    def __len__(self):
+        return len(self.mmsi)
+
+    def records(self):
+        """
+        Yields one dict per vessel with the scenario file keys (used by write())
+        """
+        for i in range(len(self)):
+            yield { "CLASS": "A" if self.class_a[i] else "B",
+                    "MMSI": str(self.mmsi[i]),
+                    "LAT": "{:.6f}".format(self.lat[i]),
+                    "LON": "{:.6f}".format(self.lon[i]),
+                    "COURSE": "{:.1f}".format(self.course[i]),
+                    "SPEED": "{:.1f}".format(self.speed[i]),
+                    "HEADING": str(self.heading[i]),
+                    "STATUS": str(self.status[i]),
+                    "SHIP_TYPE": str(self.ship_type[i]),
+                    "SHIP_NAME": str(self.ship_name[i]),
+                    "CALL_SIGN": str(self.call_sign[i]) }
+
+    def write(self, f):
+        """
+        Writes the fleet as a scenario file, one vessel per line:
+        CLASS="A" MMSI="226000001" LAT="48.100000" ... CALL_SIGN="F0A1B2"
+        """
+        for record in self.records():
+            f.write(' '.join(key + '="' + value + '"' for key, value in record.items()) + '\n')
+
+def _base36(values, width):
+    """
+    Vectorized base 36 formatting of an int array, fixed width, zero padded
+    """
+    powers = 36 ** np.arange(width - 1, -1, -1, dtype=np.int64)
+    digits = (values[:, None] // powers) % 36
+    return np.ascontiguousarray(BASE36[digits]).view('<U' + str(width)).ravel()
+
+def _weights(table, column):
+    w = np.array([row[column] for row in table], dtype=float)
+    return w / w.sum()
+
+def generate(n, seed=None, lanes=DEFAULT_LANES, ports=DEFAULT_PORTS, mids=DEFAULT_MIDS,
+             port_ratio=0.25):
+    """
+    Generates a fleet of n vessels. Same seed gives the same fleet.
+
+    Parameters
+    ----------
+    n: int
+      number of vessels
+    seed: int
+      seed of the random generator
+    lanes: list
+      shipping lanes (start lat, start lon, end lat, end lon, half width NM, weight)
+    ports: list
+      ports (lat, lon, radius NM, weight)
+    mids: list
+      Maritime Identification Digits used to build the MMSIs
+    port_ratio: float
+      ratio of vessels in ports (moored or at anchor), the others are under way on the lanes
+    """
+    if n > len(mids) * 1000000:
+        raise ValueError("Not enough MMSIs for " + str(n) + " vessels")
+    rng = np.random.default_rng(seed)
+
+    # unique MMSIs: MID followed by 6 digits
+    code = rng.choice(len(mids) * 1000000, size=n, replace=False)
+    mmsi = np.asarray(mids, dtype=np.int64)[code // 1000000] * 1000000 + code % 1000000
+
+    # ship type and class
+    kind = rng.choice(len(SHIP_TYPES), size=n, p=_weights(SHIP_TYPES, 1))
+    ship_type = np.array([row[0] for row in SHIP_TYPES])[kind]
+    class_a = rng.random(n) < np.array([row[2] for row in SHIP_TYPES])[kind]
+
+    # under way on a lane or in a port
+    in_port = rng.random(n) < port_ratio
+    lat = np.empty(n)
+    lon = np.empty(n)
+    course = np.empty(n)
+
+    # lanes: position along the segment, cross track offset, direction of travel
+    on_lane = ~in_port
+    m = int(on_lane.sum())
+    lane = np.asarray(lanes, dtype=float)[rng.choice(len(lanes), size=m, p=_weights(lanes, 5))]
+    lat0, lon0, lat1, lon1, width = lane[:, 0], lane[:, 1], lane[:, 2], lane[:, 3], lane[:, 4]
+    coslat = np.cos(np.radians((lat0 + lat1) / 2))
+    dnorth = (lat1 - lat0) * 60.0               # NM
+    deast = (lon1 - lon0) * 60.0 * coslat       # NM
+    length = np.hypot(dnorth, deast)
+    along = rng.random(m)
+    cross = rng.normal(0.0, 0.5, m).clip(-1.0, 1.0) * width
+    north = dnorth * along - deast / length * cross
+    east = deast * along + dnorth / length * cross
+    lat[on_lane] = lat0 + north / 60.0
+    lon[on_lane] = lon0 + east / 60.0 / coslat
+    bearing = np.degrees(np.arctan2(deast, dnorth))
+    reverse = rng.random(m) < 0.5
+    course[on_lane] = (bearing + 180.0 * reverse + rng.normal(0.0, 3.0, m)) % 360.0
+
+    # ports: gaussian spread around the port center, random course (no way)
+    m = int(in_port.sum())
+    port = np.asarray(ports, dtype=float)[rng.choice(len(ports), size=m, p=_weights(ports, 3))]
+    radius = port[:, 2] * np.sqrt(rng.random(m))
+    angle = rng.random(m) * 2 * math.pi
+    lat[in_port] = port[:, 0] + radius * np.cos(angle) / 60.0
+    lon[in_port] = port[:, 1] + radius * np.sin(angle) / 60.0 / np.cos(np.radians(port[:, 0]))
+    course[in_port] = rng.random(m) * 360.0
+
+    # speed by ship type, almost 0 in port
+    mean = np.array([row[3] for row in SHIP_TYPES])[kind]
+    std = np.array([row[4] for row in SHIP_TYPES])[kind]
+    speed = np.where(in_port, rng.random(n) * 0.3, rng.normal(mean, std).clip(0.5, 40.0))
+    speed = np.round(speed, 1)
+    course = np.round(course, 1) % 360.0
+    heading = (np.round(course + rng.normal(0.0, 2.0, n)).astype(np.int64)) % 360
+
+    # navigation status: moored or at anchor in port, under way otherwise
+    status = np.where(in_port, np.where(rng.random(n) < 0.8, 5, 1), 0)
+    draw = rng.random(n)
+    for shiptype, choices in UNDERWAY_STATUS.items():
+        sel = on_lane & (ship_type == shiptype)
+        threshold = 0.0
+        for value, probability in choices:
+            status[sel & (draw >= threshold) & (draw < threshold + probability)] = value
+            threshold = threshold + probability
+    status[~class_a] = NOT_AVAILABLE_STATUS
+
+    # names and call signs, made unique with a base 36 suffix from a permutation
+    # (max 20 and 7 sixbit characters)
+    serial = rng.permutation(n)
+    prefix = np.array([row[5] for row in SHIP_TYPES])[kind]
+    word = np.array(NAME_WORDS)[rng.integers(0, len(NAME_WORDS), n)]
+    ship_name = np.char.add(np.char.add(np.char.add(prefix, ' '), np.char.add(word, ' ')),
+                            _base36(serial, 5))
+    call_sign = np.char.add('F', _base36(serial, 6))
+
+    return Fleet(mmsi, class_a, lat, lon, course, speed, heading, status,
+                 ship_type, ship_name, call_sign)
@@ -0,0 +1,300 @@
+#   This program is free software: you can redistribute it and/or modify
+#   it under the terms of the GNU General Public License as published by
+#   the Free Software Foundation, either version 3 of the License, or
+#   (at your option) any later version.
+#   This program is distributed in the hope that it will be useful,
+#   but WITHOUT ANY WARRANTY; without even the implied warranty of
+#   MERCHANTABILITY or FITNESS FOR A PARTICULAR PURPOSE.  See the
+#   GNU General Public License for more details.
+
+#   You should have received a copy of the GNU General Public License
+#   along with this program.  If not, see <http://www.gnu.org/licenses/>.
+
+#	VHF Data Link (VDL) channel model.  Each of the AIS channels A and B
+#	carries 2250 slots per minute (26.67 mS each).  Every target report is
+#	given slots on a channel according to the reporting interval rules, and
+#	the sentence is only released once its slots have been transmitted.
+#	    class A (SOTDMA): keeps its slot for 3 to 7 frames (slot timeout), then
+#	        selects a new free slot in the selection interval (20% of the
+#	        reporting interval).  When no slot is free, it takes a used one and
+#	        both reports collide (the receiver gets none of them).
+#	    class B (CSTDMA): carrier sense, only transmits in a free slot of the
+#	        selection interval, the report is dropped otherwise.
+#	All the stations are assumed to be in range of the receiver and of each
+#	other.  Reports alternate between channel A and B, including the two
+#	parts of the class B static data (type 24 A and B, 1 slot each).
+
+# Reporting intervals: ITU-R M.1371-5 Annex 1, tables 1 and 2
+
+import heapq
+import random
+import aismsg
+
+SLOTS_PER_FRAME = 2250                  # slots per minute and per channel
+SLOT_TIME = 60.0 / SLOTS_PER_FRAME      # seconds
+SLOT_BITS = 256                         # raw bits of a slot
+CHANNELS = ('A', 'B')
+STATIC_INTERVAL = 360.0                 # static and voyage related data, 6 minutes
+
+def slots_for(bits):
+    """
+    Number of consecutive slots needed by a message of bits data bits
+    (168 data bits in the first slot, then 256 per slot)
+    """
+    if bits <= 168:
+        return 1
+    return 1 + (bits - 168 + SLOT_BITS - 1) // SLOT_BITS
+
+# kinds of report
+POSITION = 0
+STATIC = 1          # type 5 (class A) or type 24 part A (class B)
+STATIC_B = 2        # type 24 part B, a separate transmission after part A
+PART_B_DELAY = 15.0 # nominal delay of part B after part A (within 1 minute)
+
+SLOTS = { ('SOTDMA', POSITION): slots_for(aismsg.sizes['1']),
+          ('SOTDMA', STATIC): slots_for(aismsg.sizes['5']),
+          ('CSTDMA', POSITION): slots_for(aismsg.sizes['18']),
+          ('CSTDMA', STATIC): slots_for(aismsg.sizes['24A']),
+          ('CSTDMA', STATIC_B): slots_for(aismsg.sizes['24B']) }
+
+def encode_reports(targets, when, channels):
+    return [t.nmeaEncode(c, w) for t, c, w in zip(targets, channels, when or [None] * len(targets))]
+
+def reporting_interval(target):
+    """
+    Position reporting interval in seconds of a target
+    """
+    if target.access == 'CSTDMA':
+        # class B "CS": 3 min below 2 knots, 30 S otherwise
+        if target.speed <= 2.0:
+            return 180.0
+        return 30.0
+    # class A: 3 min at anchor or moored below 3 knots
+    if target.status in (1, 5) and target.speed <= 3.0:
+        return 180.0
+    if target.speed <= 14.0:
+        return 10.0
+    if target.speed <= 23.0:
+        return 6.0
+    return 2.0
+
+class Channel:
+    def __init__(self, name):
+        """
+        Construct a new 'Channel' object: slot occupancy of one AIS channel
+
+        Parameters
+        ----------
+        name: str
+          'A' or 'B'
+        """
+        self.name = name
+        self.occupancy = {}     # slot -> number of transmissions
+        self.announced = {}     # slot -> number of SOTDMA stations announcing it
+        self.pending = {}       # last slot -> list of (first slot, target index, kind)
+        self.released = 0       # first slot not yet released
+        self.slots = 0          # elapsed slots
+        self.used = 0           # slots with at least one transmission
+        self.collisions = 0     # slots with more than one transmission
+        self.sent = 0           # reports received
+        self.lost = 0           # reports lost in a collision
+        self.dropped = 0        # reports not sent (no free slot for CSTDMA)
+
+    def free(self, first, nslots):
+        for slot in range(first, first + nslots):
+            if slot in self.occupancy or slot in self.announced:
+                return False
+        return True
+
+    def announce(self, slot):
+        self.announced[slot] = self.announced.get(slot, 0) + 1
+
+    def unannounce(self, slot):
+        count = self.announced.pop(slot, 0) - 1
+        if count > 0:
+            self.announced[slot] = count
+
+    def reserve(self, first, nslots, index, kind):
+        for slot in range(first, first + nslots):
+            self.occupancy[slot] = self.occupancy.get(slot, 0) + 1
+        self.pending.setdefault(first + nslots - 1, []).append((first, index, kind))
+
+    def release(self, current):
+        """
+        Ends the slots before current. Returns the list of (target index, kind)
+        received without collision
+        """
+        received = []
+        for last in range(self.released, current):
+            for first, index, kind in self.pending.pop(last, []):
+                if max(self.occupancy[slot] for slot in range(first, last + 1)) > 1:
+                    self.lost = self.lost + 1
+                else:
+                    self.sent = self.sent + 1
+                    received.append((index, kind))
+        # a message can start up to 2 slots before its last slot, the occupancy
+        # of a slot is kept until all the messages using it are released
+        for slot in range(self.released - 2, current - 2):
+            self.announced.pop(slot, None)
+            count = self.occupancy.pop(slot, 0)
+            if count > 0:
+                self.used = self.used + 1
+            if count > 1:
+                self.collisions = self.collisions + 1
+        self.released = max(self.released, current)
+        return received
+
+    def stats(self):
+        """
+        Channel statistics as a dict
+        """
+        return { "channel": self.name,
+                 "slots": self.slots,
+                 "used": self.used,
+                 "collisions": self.collisions,
+                 "utilization": float(self.used) / self.slots if self.slots else 0.0,
+                 "sent": self.sent,
+                 "lost": self.lost,
+                 "dropped": self.dropped }
+
+class VDL:
+    def __init__(self, targets, start, seed=None, encode=encode_reports):
+        """
+        Construct a new 'VDL' object.
+
+        Parameters
+        ----------
+        targets: list
+          AIS targets, with an access attribute 'SOTDMA' (class A) or 'CSTDMA' (class B)
+          and the static data sent by report() (ship_name and call_sign)
+        start: float
+          time of slot 0 in seconds (time.time())
+        seed: int
+          seed of the slot selection random generator
+        encode: function
+          encodes the position reports of a list of targets at a list of
+          times (None = now) on a list of channels, together
+        """
+        self.targets = targets
+        self.encode = encode
+        self.start = start
+        self.random = random.Random(seed)
+        self.channels = [Channel(name) for name in CHANNELS]
+        self.current = 0
+        self.next_channel = [self.random.randrange(2) for t in targets]
+        self.reserved = {}      # (target index, channel index) -> [next slot, slot timeout]
+        self.part_a = {}        # target index -> channel index of the last type 24 part A
+        # reports due: (start of the selection interval, nominal slot, target index, kind)
+        # first reports are spread over the reporting interval
+        self.due = []
+        for index, target in enumerate(targets):
+            self.push(self.random.randrange(self.to_slots(reporting_interval(target))), index, POSITION)
+            # static data only for the targets with a name and call sign (see report())
+            if target.ship_name != None and target.call_sign != None:
+                self.push(self.random.randrange(self.to_slots(STATIC_INTERVAL)), index, STATIC)
+
+    def to_slots(self, seconds):
+        return max(1, int(seconds / SLOT_TIME))
+
+    def selection(self, index, kind):
+        # half of the selection interval: 20% of the reporting interval
+        if kind == STATIC_B:
+            # after part A
+            return max(1, self.to_slots(PART_B_DELAY) // 2)
+        if kind == STATIC:
+            return max(1, self.to_slots(STATIC_INTERVAL) // 10)
+        return max(1, self.to_slots(reporting_interval(self.targets[index])) // 10)
+
+    def push(self, slot, index, kind):
+        heapq.heappush(self.due, (slot - self.selection(index, kind), slot, index, kind))
+
+    def schedule(self, slot, index, kind):
+        """
+        Selects the slots of a report due at slot (nominal slot)
+        """
+        target = self.targets[index]
+        if kind == STATIC_B:
+            # part B on the other channel than part A
+            c = 1 - self.part_a.pop(index, 0)
+        else:
+            c = self.next_channel[index]
+            self.next_channel[index] = 1 - c
+        channel = self.channels[c]
+        sotdma = target.access == 'SOTDMA' and kind == POSITION
+        nslots = SLOTS[(target.access, kind)]
+
+        if kind == POSITION:
+            interval = self.to_slots(reporting_interval(target))
+            self.push(slot + interval, index, kind)
+        else:
+            interval = self.to_slots(STATIC_INTERVAL)
+            if kind == STATIC:
+                self.push(slot + interval, index, kind)
+
+        # SOTDMA: the slot announced with the previous report on this channel is
+        # used until the slot timeout
+        reservation = self.reserved.pop((index, c), None) if sotdma else None
+        if reservation:
+            channel.unannounce(reservation[0])
+        if sotdma and reservation and reservation[0] > self.current:
+            first = reservation[0]
+            timeout = reservation[1] - 1
+        else:
+            half = self.selection(index, kind)
+            low = max(self.current + 1, slot - half)
+            high = max(low, slot + half)
+            candidates = [s for s in range(low, high + 1) if channel.free(s, nslots)]
+            if candidates:
+                first = self.random.choice(candidates)
+            elif target.access == 'CSTDMA':
+                channel.dropped = channel.dropped + 1
+                return
+            else:
+                first = self.random.randint(low, high)
+            timeout = self.random.randint(3, 7)
+        channel.reserve(first, nslots, index, kind)
+        if kind == STATIC and target.access == 'CSTDMA':
+            self.part_a[index] = c
+            self.push(first + self.to_slots(PART_B_DELAY), index, STATIC_B)
+        # next report on the same channel is 2 reports later (alternate channels),
+        # a new slot is selected then if this one is already taken
+        if sotdma and timeout > 0 and channel.free(first + 2 * interval, nslots):
+            self.reserved[(index, c)] = [first + 2 * interval, timeout]
+            channel.announce(first + 2 * interval)
+
+    def step(self, now):
+        """
+        Advances the channels up to time now (seconds). Returns the NMEA
+        messages received on the channels since the last step
+        """
+        current = int((now - self.start) / SLOT_TIME)
+        while self.due and self.due[0][0] <= current:
+            start, slot, index, kind = heapq.heappop(self.due)
+            self.schedule(slot, index, kind)
+        messages = []
+        positions = []
+        channels = []
+        for channel in self.channels:
+            channel.slots = channel.slots + max(0, current - self.current)
+            for index, kind in channel.release(current):
+                target = self.targets[index]
+                if kind == POSITION:
+                    positions.append(target)
+                    channels.append(channel.name)
+                    continue
+                if target.access == 'CSTDMA':
+                    mess = target.report(channel.name, kind - STATIC)   # type 24 part 0 or 1
+                else:
+                    mess = target.report(channel.name)
+                if mess:
+                    messages.append(mess)
+        if positions:
+            messages.extend(self.encode(positions, None, channels))
+        self.current = max(self.current, current)
+        return messages
+
+    def stats(self):
+        """
+        Statistics of both channels (list of dict)
+        """
+        return [channel.stats() for channel in self.channels]